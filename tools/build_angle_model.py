@@ -13,91 +13,263 @@ The output is JavaScript code that can be used directly in the AI for aim adjust
 
 import json
 import argparse
+import math
+import os
 import sys
+import tempfile
+import zipfile
 import numpy as np
+from numpy.lib.recfunctions import structured_to_unstructured
 from pathlib import Path
+from scipy.linalg import lstsq, solve
 
-def load_shot_data(filepath):
-    """Load shot data from JSON file."""
-    with open(filepath, 'r') as f:
-        data = json.load(f)
+try:
+    import ijson
+except ImportError:
+    ijson = None
 
-    if not data:
-        raise ValueError("No shot data found in file")
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+FEATURE_KEYS = ('cutAngle', 'spinY', 'power')
+TARGET_KEY = 'angleError'
+
+# One record per valid shot: the three features followed by the target.
+# Single precision is plenty for the inputs and halves the memory traffic
+# of building and multiplying the polynomial basis; the target stays float64
+# for the fit and the metrics
+SHOT_DTYPE = np.dtype([(key, np.float32) for key in FEATURE_KEYS] + [(TARGET_KEY, np.float64)])
+
+# Past this condition number of X^T X, float32 rounding (~1e-7 relative) is
+# amplified beyond ~1e-3 in the coefficients, so the fit is redone in float64
+FLOAT32_MAX_COND = 1e4
 
-    print(f"Loaded {len(data)} shots from {filepath}")
-    return data
+# A Cholesky solve of the normal equations loses about log10(cond(X^T X))
+# digits of float64 precision; past this the fit uses pivoted QR on the basis
+NORMAL_EQ_MAX_COND = 1e8
+
+# Bumped whenever extraction changes, so stale .cache.npz files are rebuilt
+# (version 1: shots with null values are dropped rather than kept as NaN;
+# version 2: the target is cached in float64 rather than rounded to float32)
+FEATURE_CACHE_VERSION = 2
+
+# Grid resolution (cutAngle x spinY x power) of the --lut lookup table:
+# 8192 float32 values, 32 KiB
+LUT_SHAPE = (32, 16, 16)
+
+# Errors raised for malformed input by whichever JSON parser is in use
+# (orjson.JSONDecodeError subclasses json.JSONDecodeError)
+JSON_ERRORS = (json.JSONDecodeError,) + ((ijson.JSONError,) if ijson else ())
+
+def load_shot_data(filepath):
+    """
+    Iterate over shot records in a JSON file.
+    Streams records one at a time with ijson when it is installed, so the
+    parsed array never has to be held in memory; otherwise parses the whole
+    file with orjson (or json as a last resort).
+    """
+    with open(filepath, 'rb') as f:
+        if ijson is not None:
+            yield from ijson.items(f, 'item', use_float=True)
+        elif orjson is not None:
+            yield from orjson.loads(f.read())
+        else:
+            yield from json.load(f)
 
 def extract_features(data):
-    """Extract features and target from shot data."""
-    features = []
-    targets = []
+    """Extract features and target from an iterable of shot records."""
+    n_shots = 0
 
-    for shot in data:
-        # Skip shots with missing data
-        if any(key not in shot for key in ['cutAngle', 'spinY', 'power', 'angleError']):
-            continue
+    def valid_rows():
+        nonlocal n_shots
+        for shot in data:
+            n_shots += 1
 
-        features.append([
-            shot['cutAngle'],
-            shot['spinY'],
-            shot['power']
-        ])
-        targets.append(shot['angleError'])
+            # Skip shots with missing data
+            if TARGET_KEY not in shot or any(key not in shot for key in FEATURE_KEYS):
+                continue
 
-    X = np.array(features)
-    y = np.array(targets)
+            yield tuple(shot[key] for key in SHOT_DTYPE.names)
 
+    # Fill a typed array straight from the record stream, with no intermediate
+    # Python lists; the feature fields are then unpacked into an (N, 3) matrix
+    rows = np.fromiter(valid_rows(), dtype=SHOT_DTYPE)
+    if n_shots == 0:
+        raise ValueError("No shot data found in file")
+
+    X = structured_to_unstructured(rows[list(FEATURE_KEYS)])
+    y = rows[TARGET_KEY]
+    # null values come through as NaN; skip those shots like missing keys
+    valid = np.isfinite(X).all(axis=1) & np.isfinite(y)
+    X, y = X[valid], y[valid]
+
+    print(f"Loaded {n_shots} shots")
     print(f"Extracted {len(y)} valid samples")
+
+    return X, y
+
+def print_feature_summary(X, y):
+    """Print the ranges of the extracted features and target."""
     print(f"  cutAngle range: [{X[:, 0].min():.2f}, {X[:, 0].max():.2f}]")
     print(f"  spinY range: [{X[:, 1].min():.2f}, {X[:, 1].max():.2f}]")
     print(f"  power range: [{X[:, 2].min():.2f}, {X[:, 2].max():.2f}]")
     print(f"  angleError range: [{y.min():.2f}, {y.max():.2f}]")
     print(f"  angleError mean: {y.mean():.4f}, std: {y.std():.4f}")
 
+def load_features(filepath):
+    """
+    Load features and target for a shot data file.
+    Extracted arrays are cached in a .cache.npz file next to the input, keyed
+    on the input's size and modification time, so repeat runs (e.g. trying
+    different --degree values) skip JSON parsing entirely.
+    """
+    path = Path(filepath)
+    stat = path.stat()
+    key = np.array([stat.st_size, stat.st_mtime_ns, FEATURE_CACHE_VERSION])
+    cache = path.with_suffix('.cache.npz')
+
+    if cache.exists():
+        # An unreadable cache (e.g. truncated by an interrupted write) is
+        # treated as a miss and rebuilt below
+        try:
+            with np.load(cache) as data:
+                if np.array_equal(data['key'], key):
+                    X, y = data['X'], data['y']
+                    print(f"Loaded {len(y)} samples from cache {cache}")
+                    print_feature_summary(X, y)
+                    return X, y
+        except (OSError, EOFError, ValueError, KeyError, zipfile.BadZipFile) as e:
+            print(f"Warning: Ignoring unreadable feature cache {cache}: {e}", file=sys.stderr)
+
+    X, y = extract_features(load_shot_data(path))
+    print_feature_summary(X, y)
+
+    # Write to a temporary file and rename it into place, so an interrupted
+    # or failed write never leaves a partial cache behind
+    tmp = None
+    try:
+        with tempfile.NamedTemporaryFile(dir=cache.parent, prefix=cache.name + '.',
+                                         suffix='.tmp', delete=False) as f:
+            tmp = f.name
+            np.savez(f, key=key, X=X, y=y)
+        os.replace(tmp, cache)
+    except OSError as e:
+        print(f"Warning: Could not write feature cache {cache}: {e}", file=sys.stderr)
+        if tmp is not None and os.path.exists(tmp):
+            os.remove(tmp)
+
     return X, y
 
-def build_polynomial_features(X, degree):
+def count_polynomial_terms(n_features, degree):
+    """Number of monomials of total degree <= degree in n_features inputs."""
+    return sum(math.comb(n_features + d - 1, d) for d in range(degree + 1))
+
+def build_polynomial_features(X, degree, mu=None, sigma=None):
     """
     Build polynomial features from input matrix.
+    Inputs are standardized to zero mean / unit std first (using mu and sigma
+    if given, otherwise the statistics of X), which keeps the columns on a
+    similar scale and the fit well conditioned.
     For degree=2 with inputs [a, b, c], generates:
     [1, a, b, c, a^2, ab, ac, b^2, bc, c^2]
     """
     n_samples = X.shape[0]
     n_features = X.shape[1]
 
+    # Statistics are kept in float64 since they are emitted into the JS
+    if mu is None:
+        mu = X.mean(axis=0, dtype=np.float64)
+    if sigma is None:
+        sigma = X.std(axis=0, dtype=np.float64)
+        # A constant input (e.g. no spin variety) would divide by zero
+        sigma[sigma == 0] = 1.0
+    X = ((X - mu) / sigma).astype(X.dtype)
+
     # Generate all polynomial terms up to given degree
     from itertools import combinations_with_replacement
 
     feature_names = ['cutAngle', 'spinY', 'power']
-    terms = []
-    term_names = []
+
+    # Allocate the output once, column-major to match what LAPACK consumes
+    n_terms = count_polynomial_terms(n_features, degree)
+    X_poly = np.empty((n_samples, n_terms), dtype=X.dtype, order='F')
+
+    # Power cache: powers[i][k] = X[:, i] ** k, computed once per feature and
+    # power so monomials share partial products (x^2 is not recomputed for x^3)
+    powers = []
+    for i in range(n_features):
+        powers_i = [None, X[:, i]]
+        for k in range(2, degree + 1):
+            powers_i.append(powers_i[-1] * X[:, i])
+        powers.append(powers_i)
 
     # Constant term
-    terms.append(np.ones(n_samples))
-    term_names.append('1')
+    X_poly[:, 0] = 1.0
+    term_names = ['1']
 
-    # Generate terms for each degree
+    # Generate terms for each degree; each monomial is a product of cached
+    # powers across features, written in place into its column
+    j = 1
     for d in range(1, degree + 1):
         for combo in combinations_with_replacement(range(n_features), d):
-            term = np.ones(n_samples)
-            name_parts = []
-            for idx in combo:
-                term *= X[:, idx]
-                name_parts.append(feature_names[idx])
-            terms.append(term)
-            term_names.append('*'.join(name_parts))
+            factors = [powers[i][combo.count(i)] for i in sorted(set(combo))]
+            col = X_poly[:, j]
+            np.copyto(col, factors[0])
+            for factor in factors[1:]:
+                np.multiply(col, factor, out=col)
+            term_names.append('*'.join(feature_names[idx] for idx in combo))
+            j += 1
 
-    X_poly = np.column_stack(terms)
-    return X_poly, term_names
+    return X_poly, term_names, mu, sigma
+
+def gram_with_precision_check(X_poly):
+    """
+    Return (X_poly, X^T X) with X^T X in float64.
+    A float32 basis is promoted to float64 when its Gram matrix is too
+    ill-conditioned for single-precision results to be trusted.
+    """
+    XtX = (X_poly.T @ X_poly).astype(np.float64)
+    if X_poly.dtype != np.float64 and np.linalg.cond(XtX) > FLOAT32_MAX_COND:
+        X_poly = X_poly.astype(np.float64)
+        XtX = X_poly.T @ X_poly
+    return X_poly, XtX
+
+def solve_least_squares(X_poly, y_fit, XtX, Xty):
+    """
+    Least-squares coefficients for the basis X_poly, given its float64 normal
+    equations XtX, Xty.
+    The basis is tall and narrow (p << n), so a Cholesky solve of the p x p
+    normal equations is much cheaper than factorizing X_poly. With standardized
+    inputs X^T X stays well conditioned (about 4e4 at degree 6); if it is not,
+    QR with column pivoting on X_poly is used instead, with a warning.
+    Raises LinAlgError if the basis is rank deficient.
+    """
+    cond = np.linalg.cond(XtX)
+    if not np.isfinite(cond) or cond * np.finfo(np.float64).eps >= 1:
+        raise np.linalg.LinAlgError(f"X^T X is singular, condition number {cond:.3g}")
+    if cond <= NORMAL_EQ_MAX_COND:
+        return solve(XtX, Xty, assume_a='pos', check_finite=False)
+
+    print(f"Warning: X^T X is ill-conditioned (condition number {cond:.3g}); "
+          "solving by pivoted QR instead.", file=sys.stderr)
+    coeffs, _, _, _ = lstsq(X_poly, y_fit, lapack_driver='gelsy', check_finite=False)
+    return coeffs
 
 def fit_regression(X_poly, y):
-    """Fit linear regression using least squares."""
-    # Use numpy's lstsq for numerical stability
-    coeffs, residuals, rank, s = np.linalg.lstsq(X_poly, y, rcond=None)
+    """Fit linear regression by least squares."""
+    X_poly, XtX = gram_with_precision_check(X_poly)
+    y_fit = y.astype(X_poly.dtype, copy=False)
+    Xty = (X_poly.T @ y_fit).astype(np.float64)
+    coeffs = solve_least_squares(X_poly, y_fit, XtX, Xty)
+
+    # Coefficients are reported and emitted in float64; predicting in the
+    # basis' own precision avoids a float64 copy of X_poly
+    coeffs = coeffs.astype(np.float64)
+    y_pred = (X_poly @ coeffs.astype(X_poly.dtype)).astype(np.float64)
 
     # Calculate R-squared
-    y_pred = X_poly @ coeffs
     ss_res = np.sum((y - y_pred) ** 2)
     ss_tot = np.sum((y - y.mean()) ** 2)
     r_squared = 1 - (ss_res / ss_tot) if ss_tot > 0 else 0
@@ -107,8 +279,144 @@ def fit_regression(X_poly, y):
 
     return coeffs, r_squared, rmse, y_pred
 
-def generate_javascript(coeffs, term_names, degree, r_squared, rmse, n_samples):
-    """Generate JavaScript code implementing the model."""
+def horner_js(poly, variables):
+    """
+    Build a JavaScript expression evaluating a polynomial in nested Horner form.
+    poly maps exponent tuples (one exponent per variable) to coefficients; the
+    first variable is the outermost Horner variable.
+    """
+    if not poly:
+        return '0.0'
+    if not variables:
+        return f'{poly[()]:.10f}'
+
+    by_power = {}
+    for exps, coeff in poly.items():
+        by_power.setdefault(exps[0], {})[exps[1:]] = coeff
+
+    var = variables[0]
+    top = max(by_power)
+    expr = horner_js(by_power[top], variables[1:])
+    for k in range(top - 1, -1, -1):
+        if ' + ' in expr:
+            expr = f'({expr})'
+        expr = f'{expr} * {var}'
+        if k in by_power:
+            expr = f'{expr} + {horner_js(by_power[k], variables[1:])}'
+    return expr
+
+def sweep_degrees(X, y, degrees):
+    """
+    Fit and score one model per degree from a single shared X^T X.
+    Terms are ordered by degree, so the basis for a lower degree is a leading
+    block of the highest-degree basis: the normal equations for each degree are
+    slices of one Gram matrix, and only the small p x p solves are repeated.
+    """
+    X_poly, _, _, _ = build_polynomial_features(X, max(degrees))
+    X_poly, XtX_full = gram_with_precision_check(X_poly)
+    y_fit = y.astype(X_poly.dtype, copy=False)
+    Xty_full = (X_poly.T @ y_fit).astype(np.float64)
+    yty = y @ y
+    ss_tot = np.sum((y - y.mean()) ** 2)
+
+    results = []
+    for degree in degrees:
+        p = count_polynomial_terms(X.shape[1], degree)
+        XtX = XtX_full[:p, :p]
+        Xty = Xty_full[:p]
+        coeffs = solve_least_squares(X_poly[:, :p], y_fit, XtX, Xty).astype(np.float64)
+
+        # ||y - X w||^2 expanded so no n-length residual is ever formed
+        ss_res = max(yty - 2 * coeffs @ Xty + coeffs @ XtX @ coeffs, 0.0)
+        r_squared = 1 - (ss_res / ss_tot) if ss_tot > 0 else 0
+        rmse = np.sqrt(ss_res / len(y))
+        results.append((degree, p, r_squared, rmse))
+
+    return results
+
+def js_offset(name, value):
+    """JavaScript for (name - value) without a double minus."""
+    sign = '-' if value >= 0 else '+'
+    return f'({name} {sign} {abs(value):.10f})'
+
+def build_lut(coeffs, degree, mu, sigma, X, shape=LUT_SHAPE):
+    """
+    Tabulate the fitted model on a regular grid spanning the training data.
+    Returns a list of (min, step) per input and the C-ordered float32 values.
+    """
+    axes = []
+    points = []
+    for i, n in enumerate(shape):
+        lo, hi = float(X[:, i].min()), float(X[:, i].max())
+        # A constant input still needs a non-zero step
+        if hi <= lo:
+            hi = lo + 1.0
+        axes.append((lo, (hi - lo) / (n - 1)))
+        points.append(np.linspace(lo, hi, n))
+
+    grid = np.stack(np.meshgrid(*points, indexing='ij'), axis=-1).reshape(-1, len(shape))
+    grid_poly, _, _, _ = build_polynomial_features(grid, degree, mu, sigma)
+    values = (grid_poly @ coeffs).astype(np.float32)
+    return axes, values
+
+def generate_lut_javascript(axes, values, shape=LUT_SHAPE):
+    """Generate a trilinear-interpolating predictAngleError over a lookup table."""
+    (c_min, c_step), (s_min, s_step), (p_min, p_step) = axes
+    nc, ns, npw = shape
+    rows = values.reshape(-1, npw)
+    table = ',\n'.join('    ' + ', '.join(f'{v:.7g}' for v in row) for row in rows)
+
+    return f'''
+// Polynomial predictions tabulated on a {nc} x {ns} x {npw} (cutAngle x spinY x power)
+// grid spanning the training data, indexed as [(i * {ns} + j) * {npw} + k]
+const ANGLE_ERROR_GRID = new Float32Array([
+{table}
+]);
+
+/**
+ * Predict the angle error for a shot by trilinear interpolation of
+ * ANGLE_ERROR_GRID. Inputs outside the training range are clamped to it.
+ * @param {{number}} cutAngle - Cut angle in degrees (0 = straight, 90 = max)
+ * @param {{number}} spinY - Vertical spin (-1 to 1, positive = topspin)
+ * @param {{number}} power - Shot power
+ * @returns {{number}} Predicted angle error in degrees
+ */
+function predictAngleError(cutAngle, spinY, power) {{
+    // Fractional grid coordinates
+    const x = Math.min(Math.max({js_offset('cutAngle', c_min)} / {c_step:.10f}, 0), {nc - 1});
+    const y = Math.min(Math.max({js_offset('spinY', s_min)} / {s_step:.10f}, 0), {ns - 1});
+    const z = Math.min(Math.max({js_offset('power', p_min)} / {p_step:.10f}, 0), {npw - 1});
+    const i = Math.min(Math.floor(x), {nc - 2});
+    const j = Math.min(Math.floor(y), {ns - 2});
+    const k = Math.min(Math.floor(z), {npw - 2});
+    const fx = x - i;
+    const fy = y - j;
+    const fz = z - k;
+
+    const g = ANGLE_ERROR_GRID;
+    const i00 = (i * {ns} + j) * {npw} + k;
+    const i01 = i00 + {npw};
+    const i10 = i00 + {ns * npw};
+    const i11 = i10 + {npw};
+    const c00 = g[i00] + (g[i00 + 1] - g[i00]) * fz;
+    const c01 = g[i01] + (g[i01 + 1] - g[i01]) * fz;
+    const c10 = g[i10] + (g[i10 + 1] - g[i10]) * fz;
+    const c11 = g[i11] + (g[i11 + 1] - g[i11]) * fz;
+    const c0 = c00 + (c01 - c00) * fy;
+    const c1 = c10 + (c11 - c10) * fy;
+    return c0 + (c1 - c0) * fx;
+}}
+'''
+
+def generate_javascript(coeffs, term_names, mu, sigma, degree, r_squared, rmse, n_samples,
+                        lut=None):
+    """
+    Generate JavaScript code implementing the model.
+    If lut (axes, values) is given, predictAngleError interpolates that table
+    and the polynomial is emitted as predictAngleErrorPolynomial.
+    """
+    feature_names = ['cutAngle', 'spinY', 'power']
+    poly_func = 'predictAngleErrorPolynomial' if lut else 'predictAngleError'
 
     js_code = f'''/**
  * AI Angle Error Prediction Model
@@ -129,38 +437,50 @@ def generate_javascript(coeffs, term_names, degree, r_squared, rmse, n_samples):
  * @param {{number}} power - Shot power
  * @returns {{number}} Predicted angle error in degrees
  */
-function predictAngleError(cutAngle, spinY, power) {{
+function {poly_func}(cutAngle, spinY, power) {{
 '''
 
-    # Build the polynomial calculation
-    # We need to generate code that computes each term
-    terms_code = []
-    for i, (coeff, name) in enumerate(zip(coeffs, term_names)):
+    # Standardize inputs the same way the training features were
+    for name, m, sd in zip(feature_names, mu, sigma):
+        js_code += f'    const {name}N = {js_offset(name, m)} / {sd:.10f};\n'
+
+    # Pivot the fitted terms into {(cutAngle, spinY, power) exponents: coeff}
+    poly = {}
+    for coeff, name in zip(coeffs, term_names):
         if abs(coeff) < 1e-10:
             continue
-
-        # Convert term name to JavaScript expression
-        if name == '1':
-            expr = f'{coeff:.10f}'
-        else:
-            parts = name.split('*')
-            js_expr = ' * '.join(parts)
-            expr = f'{coeff:.10f} * {js_expr}'
-
-        terms_code.append(expr)
-
-    # Join terms with proper formatting
-    if len(terms_code) <= 3:
-        js_code += f'    return {" + ".join(terms_code)};\n'
+        parts = [] if name == '1' else name.split('*')
+        poly[tuple(parts.count(f) for f in feature_names)] = coeff
+
+    # Horner scheme in cutAngle, one statement per power; each coefficient is
+    # itself a nested Horner polynomial in spinY and power
+    by_cut_power = {}
+    for exps, coeff in poly.items():
+        by_cut_power.setdefault(exps[0], {})[exps[1:]] = coeff
+
+    inner_vars = [f'{name}N' for name in feature_names[1:]]
+    if not by_cut_power:
+        js_code += '    return 0.0;\n'
     else:
-        js_code += '    return (\n'
-        for i, term in enumerate(terms_code):
-            prefix = '        ' if i == 0 else '        + '
-            js_code += f'{prefix}{term}\n'
-        js_code += '    );\n'
+        top = max(by_cut_power)
+        js_code += f'    let r = {horner_js(by_cut_power[top], inner_vars)};\n'
+        for k in range(top - 1, -1, -1):
+            if k in by_cut_power:
+                js_code += (f'    r = r * cutAngleN + '
+                            f'{horner_js(by_cut_power[k], inner_vars)};\n')
+            else:
+                js_code += '    r = r * cutAngleN;\n'
+        js_code += '    return r;\n'
 
     js_code += '}\n'
 
+    if lut:
+        js_code += generate_lut_javascript(*lut)
+
+    exports = 'predictAngleError, calculateAimAdjustment, ANGLE_MODEL_INFO'
+    if lut:
+        exports = f'predictAngleError, {poly_func}, calculateAimAdjustment, ANGLE_MODEL_INFO'
+
     # Add a convenience function for aim adjustment
     js_code += f'''
 /**
@@ -181,12 +501,17 @@ const ANGLE_MODEL_INFO = {{
     rmse: {rmse:.4f},
     nSamples: {n_samples},
     features: ['cutAngle', 'spinY', 'power'],
+    // Coefficients apply to inputs standardized as (x - mean) / std
+    normalization: {{
+        mean: {json.dumps(mu.tolist())},
+        std: {json.dumps(sigma.tolist())}
+    }},
     coefficients: {json.dumps(dict(zip(term_names, coeffs.tolist())), indent=8)}
 }};
 
 // Export for use in modules
 if (typeof module !== 'undefined' && module.exports) {{
-    module.exports = {{ predictAngleError, calculateAimAdjustment, ANGLE_MODEL_INFO }};
+    module.exports = {{ {exports} }};
 }}
 '''
 
@@ -230,32 +555,57 @@ def main():
                         help='Output JavaScript file (default: angle_model.js)')
     parser.add_argument('--analyze', '-a', action='store_true',
                         help='Show detailed analysis')
+    parser.add_argument('--sweep-degrees', metavar='D1,D2,...',
+                        type=lambda s: sorted({int(d) for d in s.split(',')}),
+                        help='Compare fit quality across several degrees '
+                             '(e.g. 2,3,4) instead of writing a model')
+    parser.add_argument('--lut', action='store_true',
+                        help='Emit predictAngleError as trilinear interpolation '
+                             'over a precomputed lookup table')
 
     args = parser.parse_args()
 
-    # Load data
+    # Load data and extract features (records are streamed, so parse errors
+    # surface while extracting)
     try:
-        data = load_shot_data(args.input)
+        X, y = load_features(args.input)
     except FileNotFoundError:
         print(f"Error: File not found: {args.input}", file=sys.stderr)
         sys.exit(1)
-    except json.JSONDecodeError as e:
+    except JSON_ERRORS as e:
         print(f"Error: Invalid JSON: {e}", file=sys.stderr)
         sys.exit(1)
 
-    # Extract features
-    X, y = extract_features(data)
-
     if len(y) < 10:
         print("Warning: Very few samples. Model may not be reliable.", file=sys.stderr)
 
+    if args.sweep_degrees:
+        try:
+            results = sweep_degrees(X, y, args.sweep_degrees)
+        except np.linalg.LinAlgError as e:
+            print(f"Error: Polynomial basis is rank deficient ({e}). "
+                  "Collect more varied data or lower the degrees.", file=sys.stderr)
+            sys.exit(1)
+
+        print("\n=== Degree Sweep ===")
+        for degree, n_terms, r_squared, rmse in results:
+            print(f"  degree {degree}: {n_terms:3d} terms, "
+                  f"R-squared={r_squared:.4f}, RMSE={rmse:.4f} degrees")
+        print("\nRe-run with --degree N to generate the model for the chosen degree.")
+        return
+
     # Build polynomial features
-    X_poly, term_names = build_polynomial_features(X, args.degree)
+    X_poly, term_names, mu, sigma = build_polynomial_features(X, args.degree)
     print(f"\nPolynomial features (degree {args.degree}): {len(term_names)} terms")
     print(f"  Terms: {', '.join(term_names)}")
 
     # Fit model
-    coeffs, r_squared, rmse, y_pred = fit_regression(X_poly, y)
+    try:
+        coeffs, r_squared, rmse, y_pred = fit_regression(X_poly, y)
+    except np.linalg.LinAlgError as e:
+        print(f"Error: Polynomial basis is rank deficient ({e}). "
+              "Collect more varied data or lower --degree.", file=sys.stderr)
+        sys.exit(1)
 
     print(f"\n=== Model Performance ===")
     print(f"  R-squared: {r_squared:.4f}")
@@ -263,7 +613,7 @@ def main():
     print(f"  Mean Absolute Error: {np.mean(np.abs(y - y_pred)):.4f} degrees")
 
     # Show significant coefficients
-    print(f"\nSignificant coefficients:")
+    print(f"\nSignificant coefficients (standardized inputs):")
     sorted_indices = np.argsort(np.abs(coeffs))[::-1]
     for idx in sorted_indices[:10]:
         if abs(coeffs[idx]) > 1e-6:
@@ -273,8 +623,9 @@ def main():
         analyze_data(X, y, y_pred)
 
     # Generate JavaScript
-    js_code = generate_javascript(coeffs, term_names, args.degree,
-                                   r_squared, rmse, len(y))
+    lut = build_lut(coeffs, args.degree, mu, sigma, X) if args.lut else None
+    js_code = generate_javascript(coeffs, term_names, mu, sigma, args.degree,
+                                   r_squared, rmse, len(y), lut=lut)
 
     # Write output
     output_path = Path(args.output)
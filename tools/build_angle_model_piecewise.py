@@ -1,8 +1,10 @@
 #!/usr/bin/env python3
 import json
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 import numpy as np
 from pathlib import Path
+from scipy.linalg import lstsq
 
 # =========================
 # MODEL CONFIG
@@ -45,16 +47,9 @@ err = np.array([d["angleError"] for d in data])
 # angleError = c0 + c1*x + c2*x^2 + c3*x^3
 # =========================
 low_mask = cut <= CUT_BREAK_DEG
-X_low = np.column_stack([
-    np.ones(low_mask.sum()),
-    cut[low_mask],
-    cut[low_mask] ** 2,
-    cut[low_mask] ** 3,
-])
+X_low = np.polynomial.polynomial.polyvander(cut[low_mask], 3)
 y_low = err[low_mask]
 
-coef_low, *_ = np.linalg.lstsq(X_low, y_low, rcond=None)
-
 # =========================
 # HIGH CUT MODEL
 # angleError =
@@ -74,28 +69,31 @@ X_high = np.column_stack([
 ])
 y_high = err[high_mask]
 
-coef_high, *_ = np.linalg.lstsq(X_high, y_high, rcond=None)
+# =========================
+# FIT
+# The two least-squares problems are independent and LAPACK releases the
+# GIL, so solve them concurrently
+# =========================
+with ThreadPoolExecutor(max_workers=2) as ex:
+    f_low = ex.submit(lstsq, X_low, y_low, lapack_driver='gelsy', check_finite=False)
+    f_high = ex.submit(lstsq, X_high, y_high, lapack_driver='gelsy', check_finite=False)
+    coef_low = f_low.result()[0]
+    coef_high = f_high.result()[0]
 
 # =========================
 # METRICS
 # =========================
-def predict(c, p, d):
-    if c <= CUT_BREAK_DEG:
-        return (
-            coef_low[0]
-            + coef_low[1] * c
-            + coef_low[2] * c ** 2
-            + coef_low[3] * c ** 3
-        )
-    return (
-        coef_high[0]
-        + coef_high[1] * c
-        + coef_high[2] * p
-        + coef_high[3] * d
-        + coef_high[4] * c * d
-    )
-
-pred = np.array([predict(c, p, d) for c, p, d in zip(cut, power, dist)])
+# Horner form: ((c3*x + c2)*x + c1)*x + c0
+low_pred = ((coef_low[3] * cut + coef_low[2]) * cut + coef_low[1]) * cut + coef_low[0]
+high_pred = (
+    coef_high[0]
+    + coef_high[1] * cut
+    + coef_high[2] * power
+    + coef_high[3] * dist
+    + coef_high[4] * cut * dist
+)
+
+pred = np.where(low_mask, low_pred, high_pred)
 resid = err - pred
 
 ss_res = np.sum(resid ** 2)
@@ -120,10 +118,10 @@ with open(output_path, "w") as f:
 function predictAngleError(cutAngle, distance, power) {{
   if (cutAngle <= {CUT_BREAK_DEG}) {{
     return (
-      {coef_low[0]:.12f}
-      + {coef_low[1]:.12f} * cutAngle
-      + {coef_low[2]:.12f} * cutAngle * cutAngle
-      + {coef_low[3]:.12f} * cutAngle * cutAngle * cutAngle
+      (({coef_low[3]:.12f} * cutAngle
+        + {coef_low[2]:.12f}) * cutAngle
+        + {coef_low[1]:.12f}) * cutAngle
+      + {coef_low[0]:.12f}
     );
   }}
 
@@ -2,15 +2,23 @@
 import argparse
 import json
 import math
+import textwrap
 from pathlib import Path
 from datetime import datetime
 
 import numpy as np
-from sklearn.pipeline import Pipeline
+from scipy.linalg import cho_factor, cho_solve
 from sklearn.preprocessing import PolynomialFeatures
-from sklearn.linear_model import Ridge
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import mean_squared_error, r2_score, mean_absolute_error
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import pandas as pd
+except ImportError:
+    pd = None
 
 
 # ----------------------------
@@ -45,20 +53,38 @@ TARGET_CLIP = 15.0
 # Helpers
 # ----------------------------
 def rmse(y_true, y_pred) -> float:
-    return math.sqrt(mean_squared_error(y_true, y_pred))
+    d = y_pred - y_true
+    return math.sqrt((d @ d) / len(d))
+
+
+def regression_metrics(y_true, y_pred) -> dict:
+    """RMSE, MAE and R^2 from a single residual vector (same conventions as sklearn.metrics)."""
+    d = y_pred - y_true
+    n = len(d)
+    sse = float(d @ d)
+    yc = y_true - y_true.mean()
+    ss_tot = float(yc @ yc)
+    if ss_tot > 0:
+        r2 = 1.0 - sse / ss_tot
+    else:
+        r2 = 1.0 if sse == 0 else 0.0
+    return {"rmse": math.sqrt(sse / n), "mae": float(np.abs(d).sum() / n), "r2": r2}
 
 
-def build_poly_ridge(degree: int, alpha: float) -> Pipeline:
-    return Pipeline(
-        [
-            ("poly", PolynomialFeatures(degree=degree, include_bias=True)),
-            ("ridge", Ridge(alpha=alpha, fit_intercept=False)),
-        ]
-    )
+def ridge_solve(G: np.ndarray, b: np.ndarray, alpha: float) -> np.ndarray:
+    """
+    Closed-form ridge weights from G = Phi^T Phi, b = Phi^T y.
+    Equivalent to Ridge(alpha, fit_intercept=False): solves (G + alpha*I) w = b
+    by Cholesky, since G + alpha*I is symmetric positive definite.
+    """
+    A = G.copy()
+    A.flat[:: A.shape[0] + 1] += alpha
+    return cho_solve(cho_factor(A, lower=True, check_finite=False), b, check_finite=False)
 
 
 def load_rows(path: Path):
-    rows = json.loads(path.read_text())
+    raw = path.read_bytes()
+    rows = orjson.loads(raw) if orjson is not None else json.loads(raw)
     if isinstance(rows, dict) and "data" in rows:
         rows = rows["data"]
     if not isinstance(rows, list):
@@ -66,6 +92,33 @@ def load_rows(path: Path):
     return rows
 
 
+def _as_float(v) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return float("nan")
+
+
+def rows_to_array(rows) -> np.ndarray:
+    """
+    Convert rows to an (N, 3) float array of [cutAngle, power, target].
+    Missing or non-numeric values become NaN.
+    """
+    cols = [(r.get("cutAngle"), r.get("power"), r.get(TARGET)) for r in rows]
+    try:
+        # One vectorized conversion; None becomes NaN
+        return np.array(cols, dtype=float).reshape(-1, 3)
+    except (TypeError, ValueError):
+        pass
+
+    # Some value is not numeric: coerce column-wise in pandas if available,
+    # otherwise element by element
+    if pd is not None:
+        df = pd.DataFrame(cols, columns=["cutAngle", "power", TARGET])
+        return df.apply(pd.to_numeric, errors="coerce").to_numpy(np.float64).reshape(-1, 3)
+    return np.array([[_as_float(v) for v in c] for c in cols], dtype=float).reshape(-1, 3)
+
+
 def make_brackets_auto(powers: np.ndarray, n: int):
     lo = float(np.min(powers))
     hi = float(np.max(powers))
@@ -77,70 +130,235 @@ def make_brackets_auto(powers: np.ndarray, n: int):
     return brackets
 
 
-def fit_piecewise_cutangle(X_train, y_train, split_angle, model_left, model_right):
-    mask_left = X_train[:, 0] < split_angle
-    Xl, yl = X_train[mask_left], y_train[mask_left]
-    Xr, yr = X_train[~mask_left], y_train[~mask_left]
-    if len(yl) < MIN_SAMPLES_PER_SIDE or len(yr) < MIN_SAMPLES_PER_SIDE:
+def fit_bracket(Xb, Phib, yb, random_seed: int):
+    """
+    Train/test split one power bracket, sweep the cutAngle split and fit the
+    left/right ridge models. Returns the best fit and its holdout predictions,
+    or None if no split leaves enough samples on both sides.
+    """
+    # Same shuffle as train_test_split(test_size=TEST_SIZE, random_state=random_seed),
+    # without its validation and copying overhead
+    n = len(yb)
+    n_test = math.ceil(TEST_SIZE * n)
+    perm = np.random.RandomState(random_seed).permutation(n)
+    te, tr = perm[:n_test], perm[n_test:]
+    X_train, X_test = Xb[tr], Xb[te]
+    Phi_tr, Phi_te = Phib[tr], Phib[te]
+    y_train, y_test = yb[tr], yb[te]
+
+    # With training rows sorted by cutAngle, the left side of every split is a
+    # prefix. Accumulate its Gram matrix and moment vector incrementally as the
+    # split advances (the right side is the total minus the left), so each row
+    # enters a Gram product once instead of once per split.
+    order = np.argsort(X_train[:, 0], kind="stable")
+    angles_tr = X_train[order, 0]
+    Phi_s = Phi_tr[order]
+    y_s = y_train[order]
+
+    # Splits that leave enough samples on both sides form one contiguous run;
+    # find it from the sorted angles before doing any Gram work
+    splits = range(SPLIT_MIN, SPLIT_MAX + 1, SPLIT_STEP)
+    n_lefts = np.searchsorted(angles_tr, splits, side="left")
+    n_tr = len(y_s)
+    valid = np.flatnonzero((n_lefts >= MIN_SAMPLES_PER_SIDE) & (n_tr - n_lefts >= MIN_SAMPLES_PER_SIDE))
+    if len(valid) == 0:
         return None
-    model_left.fit(Xl, yl)
-    model_right.fit(Xr, yr)
-    return model_left, model_right
-
-
-def predict_piecewise_cutangle(X, split_angle, model_left, model_right):
-    mask_left = X[:, 0] < split_angle
-    out = np.empty(X.shape[0], dtype=float)
-    if np.any(mask_left):
-        out[mask_left] = model_left.predict(X[mask_left])
-    if np.any(~mask_left):
-        out[~mask_left] = model_right.predict(X[~mask_left])
-    return out
-
-
-def extract_poly_ridge_coeffs(model: Pipeline):
-    poly = model.named_steps["poly"]
-    ridge = model.named_steps["ridge"]
-    names = poly.get_feature_names_out()
-    coefs = ridge.coef_
-    return list(zip(names, coefs))
-
-
-def js_from_poly_ridge(model: Pipeline, func_name: str, xmap: dict) -> str:
+    valid_lo, valid_hi = int(valid[0]), int(valid[-1])
+
+    # Keep the Gram matrices in float64: the unscaled degree-3 features give
+    # cond(G) around 1e13, and in float32 G_tot - G_L is no longer positive
+    # definite, so the Cholesky factorization in ridge_solve fails
+    G_tot = Phi_s.T @ Phi_s
+    b_tot = Phi_s.T @ y_s
+
+    angles_te = np.ascontiguousarray(X_test[:, 0])
+
+    # Score every valid split: holdout RMSE is not unimodal in the split angle
+    # at typical bracket sizes, so the scan is exhaustive. Rows below the first
+    # valid split enter the left-hand Gram matrix as one block.
+    G_L = np.zeros_like(G_tot)
+    b_L = np.zeros_like(b_tot)
+    best = None
+    prev = 0
+    for split, n_left in zip(splits[valid_lo:valid_hi + 1], n_lefts[valid_lo:valid_hi + 1]):
+        block = Phi_s[prev:n_left]
+        G_L += block.T @ block
+        b_L += block.T @ y_s[prev:n_left]
+        prev = n_left
+
+        wL = ridge_solve(G_L, b_L, RIDGE_ALPHA)
+        wR = ridge_solve(G_tot - G_L, b_tot - b_L, RIDGE_ALPHA)
+
+        pred = np.where(angles_te < split, Phi_te @ wL, Phi_te @ wR)
+        score = rmse(y_test, pred)
+
+        # Keep the winning split's holdout predictions to avoid predicting again
+        if best is None or score < best["rmse"]:
+            best = {"split": split, "rmse": score, "wL": wL, "wR": wR, "pred": pred}
+
+    split, wL, wR, pred = best["split"], best["wL"], best["wR"], best["pred"]
+
+    br = regression_metrics(y_test, pred)
+
+    left_mask = angles_te < split
+    right_mask = ~left_mask
+    rmse_left = rmse(y_test[left_mask], pred[left_mask]) if left_mask.any() else float("nan")
+    rmse_right = rmse(y_test[right_mask], pred[right_mask]) if right_mask.any() else float("nan")
+
+    return {
+        "split": int(split),
+        "rmse": br["rmse"],
+        "r2": br["r2"],
+        "rmse_left": float(rmse_left),
+        "rmse_right": float(rmse_right),
+        "wL": wL,
+        "wR": wR,
+        "y_test": y_test,
+        "pred": pred,
+    }
+
+
+def js_from_poly_ridge(feature_names, coef: np.ndarray, func_name: str, xmap: dict) -> str:
     """
-    Export PolynomialFeatures+Ridge(fit_intercept=False) to JS.
+    Export PolynomialFeatures features with ridge weights (no intercept) to JS.
     sklearn feature names: 1, x0, x1, x0^2, x0 x1, ...
     We map x0/x1 to real JS identifiers using xmap, e.g. x0->cutAngle, x1->power.
+    Powers are emitted once as shared consts (c, c2, c3, p, p2, ...) so the
+    sum is plain multiplies rather than a Math.pow call per term.
     """
-    coeffs = extract_poly_ridge_coeffs(model)
-
-    def repl_var(tok: str) -> str:
-        return xmap.get(tok, tok)
-
-    def term_to_js(term: str) -> str:
-        if term == "1":
-            return "1.0"
-        parts = term.split(" ")
-        js_parts = []
-        for p in parts:
-            if "^" in p:
-                base, pw = p.split("^")
-                base = repl_var(base)
-                js_parts.append(f"Math.pow({base}, {int(pw)})")
-            else:
-                js_parts.append(repl_var(p))
-        return "(" + " * ".join(js_parts) + ")"
-
-    lines = [f"function {func_name}(cutAngle, power) {{", "  return ("]
-    for name, c in coeffs:
-        lines.append(f"    {c:.12g} * {term_to_js(name)} +")
+    # parse "x0^2 x1" -> [("x0", 2), ("x1", 1)], tracking the highest power per variable
+    terms = []
+    max_pow = {}
+    for name in feature_names:
+        factors = []
+        if name != "1":
+            for tok in name.split(" "):
+                base, _, pw = tok.partition("^")
+                k = int(pw) if pw else 1
+                factors.append((base, k))
+                max_pow[base] = max(max_pow.get(base, 0), k)
+        terms.append(factors)
+
+    # short alias per variable: cutAngle -> c, power -> p
+    alias = {v: xmap.get(v, v)[0] for v in max_pow}
+
+    def mono(base: str, k: int) -> str:
+        return alias[base] if k == 1 else f"{alias[base]}{k}"
+
+    decls = []
+    for v in sorted(max_pow):
+        decls.append(f"{alias[v]} = {xmap.get(v, v)}")
+        decls += [f"{mono(v, k)} = {mono(v, k - 1)} * {alias[v]}" for k in range(2, max_pow[v] + 1)]
+
+    lines = [f"function {func_name}(cutAngle, power) {{"]
+    if decls:
+        lines.append(f"  const {', '.join(decls)};")
+    lines.append("  return (")
+    for factors, c in zip(terms, coef):
+        if factors:
+            lines.append(f"    {c:.12g} * {' * '.join(mono(b, k) for b, k in factors)} +")
+        else:
+            lines.append(f"    {c:.12g} +")
     lines[-1] = lines[-1].rstrip(" +")
     lines += ["  );", "}"]
     return "\n".join(lines)
 
 
+JS_HEADER_TEMPLATE = """\
+/* eslint-disable no-var, prefer-const */
+/**
+ * Auto-generated angle error model.
+ *
+ * Trained on: {input_filename}
+ * Features: cutAngle, spinY, power
+ * Model: piecewise PolynomialFeatures(degree={poly_degree}) + Ridge
+ * Output clip: [-{clip:g}, {clip:g}] degrees
+ * Generated (UTC): {now}
+ * Metrics (overall holdout test, random_state=42):
+ *   rSquared: {r2:.6f}
+ *   rmse: {rmse:.6f}
+ *   mae: {mae:.6f}
+ *
+ * Generated by build_angle_model_nn.py
+ */
+"""
+
+JS_BRACKET_TEMPLATE = """\
+// Bracket {bi}: power in [{pmin}, {pmax}) (n={n}, split={split}, rmse={rmse:.4f})
+{left_js}
+
+{right_js}
+"""
+
+# Leaf of the routing tree: evaluate a bracket's left/right model and clip
+JS_ROUTE_TEMPLATE = """\
+const split = {split};
+let y = (cutAngle < split)
+  ? __predictAngleError_b{bi}_left(cutAngle, power)
+  : __predictAngleError_b{bi}_right(cutAngle, power);
+if (y > {clip:g}) y = {clip:g};
+else if (y < -{clip:g}) y = -{clip:g};
+return y;"""
+
+JS_WRAPPER_HEAD = """\
+/**
+ * Predict the angle error for a shot
+ * @param {number} cutAngle - Cut angle in degrees (0 = straight, 90 = max)
+ * @param {number} spinY - Vertical spin (-1 to 1, positive = topspin)
+ * @param {number} power - Shot power
+ * @returns {number} Predicted angle error in degrees
+ */
+function predictAngleError(cutAngle, spinY, power) {
+  // basic input sanitization (avoid NaN/Infinity propagating)
+  if (!Number.isFinite(cutAngle) || !Number.isFinite(spinY) || !Number.isFinite(power)) return 0;
+
+  // NOTE: spinY is accepted for compatibility but not used by this model.
+"""
+
+# metadata: keep same object name and export style as your MLP version
+JS_FOOTER_TEMPLATE = """\
+}}
+
+/**
+ * Calculate aim adjustment to compensate for predicted angle error
+ * @param {{number}} cutAngle - Cut angle in degrees
+ * @param {{number}} spinY - Vertical spin
+ * @param {{number}} power - Shot power
+ * @returns {{number}} Angle adjustment in degrees (subtract from aim)
+ */
+function calculateAimAdjustment(cutAngle, spinY, power) {{
+  return predictAngleError(cutAngle, spinY, power);
+}}
+
+// Model metadata
+const ANGLE_MODEL_INFO = {{
+  modelType: "piecewise_poly_ridge",
+  degree: {poly_degree},
+  clip: {clip:g},
+  nSamples: {n_samples_total},
+  features: ["cutAngle", "spinY", "power"],
+  piecewise: {{
+    brackets: [
+{bracket_info}
+    ]
+  }},
+  metrics: {{
+    rSquared: {r2:.6f},
+    rmse: {rmse:.6f},
+    mae: {mae:.6f}
+  }}
+}};
+
+// Export for use in modules
+if (typeof module !== "undefined" && module.exports) {{
+  module.exports = {{ predictAngleError, calculateAimAdjustment, ANGLE_MODEL_INFO }};
+}}
+"""
+
+
 def build_js(
     results,
+    feature_names,
     input_filename: str,
     n_samples_total: int,
     poly_degree: int,
@@ -148,144 +366,64 @@ def build_js(
     metrics: dict,
 ) -> str:
     now = datetime.utcnow().strftime("%Y-%m-%d %H:%M:%SZ")
+    xmap = {"x0": "cutAngle", "x1": "power"}
 
-    out = []
-    out.append("/* eslint-disable no-var, prefer-const */")
-    out.append("/**")
-    out.append(" * Auto-generated angle error model.")
-    out.append(" *")
-    out.append(f" * Trained on: {input_filename}")
-    out.append(" * Features: cutAngle, spinY, power")
-    out.append(f" * Model: piecewise PolynomialFeatures(degree={poly_degree}) + Ridge")
-    out.append(f" * Output clip: [-{clip_val:g}, {clip_val:g}] degrees")
-    out.append(f" * Generated (UTC): {now}")
-    out.append(" * Metrics (overall holdout test, random_state=42):")
-    out.append(f" *   rSquared: {metrics['r2']:.6f}")
-    out.append(f" *   rmse: {metrics['rmse']:.6f}")
-    out.append(f" *   mae: {metrics['mae']:.6f}")
-    out.append(" *")
-    out.append(" * Generated by build_angle_model_nn.py")
-    out.append(" */")
-    out.append("")
+    def route_tree(brs, depth: int) -> str:
+        # Balanced binary search on power over the sorted brackets: O(log n)
+        # comparisons per call instead of testing each bracket in turn
+        pad = "  " * depth
+        if len(brs) == 1:
+            r = brs[0]
+            return textwrap.indent(JS_ROUTE_TEMPLATE.format(split=r["split"], bi=r["bi"], clip=clip_val), pad)
+        mid = len(brs) // 2
+        return (
+            f"{pad}if (power < {brs[mid]['pmin']}) {{\n{route_tree(brs[:mid], depth + 1)}\n"
+            f"{pad}}} else {{\n{route_tree(brs[mid:], depth + 1)}\n{pad}}}"
+        )
+
+    out = [
+        JS_HEADER_TEMPLATE.format(
+            input_filename=input_filename,
+            poly_degree=poly_degree,
+            clip=clip_val,
+            now=now,
+            **metrics,
+        )
+    ]
 
     # Emit bracket functions
-    xmap = {"x0": "cutAngle", "x1": "power"}
-    for r in results:
-        bi = r["bi"]
-        pmin, pmax = r["pmin"], r["pmax"]
-        split = r["split"]
-        fL = f"__predictAngleError_b{bi}_left"
-        fR = f"__predictAngleError_b{bi}_right"
-        out.append(
-            f"// Bracket {bi}: power in [{pmin}, {pmax}) (n={r['n']}, split={split}, rmse={r['rmse']:.4f})"
+    out += [
+        JS_BRACKET_TEMPLATE.format(
+            bi=r["bi"],
+            pmin=r["pmin"],
+            pmax=r["pmax"],
+            n=r["n"],
+            split=r["split"],
+            rmse=r["rmse"],
+            left_js=js_from_poly_ridge(feature_names, r["wL"], f"__predictAngleError_b{r['bi']}_left", xmap),
+            right_js=js_from_poly_ridge(feature_names, r["wR"], f"__predictAngleError_b{r['bi']}_right", xmap),
         )
-        out.append(js_from_poly_ridge(r["mL"], fL, xmap))
-        out.append("")
-        out.append(js_from_poly_ridge(r["mR"], fR, xmap))
-        out.append("")
-
-    # Wrapper
-    out.append("/**")
-    out.append(" * Predict the angle error for a shot")
-    out.append(" * @param {number} cutAngle - Cut angle in degrees (0 = straight, 90 = max)")
-    out.append(" * @param {number} spinY - Vertical spin (-1 to 1, positive = topspin)")
-    out.append(" * @param {number} power - Shot power")
-    out.append(" * @returns {number} Predicted angle error in degrees")
-    out.append(" */")
-    out.append("function predictAngleError(cutAngle, spinY, power) {")
-    out.append("  // basic input sanitization (avoid NaN/Infinity propagating)")
-    out.append("  if (!Number.isFinite(cutAngle) || !Number.isFinite(spinY) || !Number.isFinite(power)) return 0;")
-    out.append("")
-    out.append("  // NOTE: spinY is accepted for compatibility but not used by this model.")
-    out.append("")
-
-    # bracket routing
-    for idx, r in enumerate(results):
-        bi = r["bi"]
-        pmin, pmax = r["pmin"], r["pmax"]
-        split = r["split"]
-        cond = f"(power >= {pmin} && power < {pmax})"
-        if idx == 0:
-            out.append(f"  if {cond} {{")
-        else:
-            out.append(f"  else if {cond} {{")
-        out.append(f"    const split = {split};")
-        out.append(f"    let y = (cutAngle < split)")
-        out.append(f"      ? __predictAngleError_b{bi}_left(cutAngle, power)")
-        out.append(f"      : __predictAngleError_b{bi}_right(cutAngle, power);")
-        out.append(f"    if (y > {clip_val:g}) y = {clip_val:g};")
-        out.append(f"    else if (y < -{clip_val:g}) y = -{clip_val:g};")
-        out.append("    return y;")
-        out.append("  }")
-
-    # fallback clamp
-    out.append("  // fallback: clamp to nearest bracket")
-    if results:
-        first = results[0]
-        last = results[-1]
-
-        out.append(f"  if (power < {first['pmin']}) {{")
-        out.append(f"    const split = {first['split']};")
-        out.append(f"    let y = (cutAngle < split)")
-        out.append(f"      ? __predictAngleError_b{first['bi']}_left(cutAngle, power)")
-        out.append(f"      : __predictAngleError_b{first['bi']}_right(cutAngle, power);")
-        out.append(f"    if (y > {clip_val:g}) y = {clip_val:g};")
-        out.append(f"    else if (y < -{clip_val:g}) y = -{clip_val:g};")
-        out.append("    return y;")
-        out.append("  }")
-
-        out.append("  {")
-        out.append(f"    const split = {last['split']};")
-        out.append(f"    let y = (cutAngle < split)")
-        out.append(f"      ? __predictAngleError_b{last['bi']}_left(cutAngle, power)")
-        out.append(f"      : __predictAngleError_b{last['bi']}_right(cutAngle, power);")
-        out.append(f"    if (y > {clip_val:g}) y = {clip_val:g};")
-        out.append(f"    else if (y < -{clip_val:g}) y = -{clip_val:g};")
-        out.append("    return y;")
-        out.append("  }")
-    else:
-        out.append("  return 0;")
-    out.append("}")
-    out.append("")
-
-    out.append("/**")
-    out.append(" * Calculate aim adjustment to compensate for predicted angle error")
-    out.append(" * @param {number} cutAngle - Cut angle in degrees")
-    out.append(" * @param {number} spinY - Vertical spin")
-    out.append(" * @param {number} power - Shot power")
-    out.append(" * @returns {number} Angle adjustment in degrees (subtract from aim)")
-    out.append(" */")
-    out.append("function calculateAimAdjustment(cutAngle, spinY, power) {")
-    out.append("  return predictAngleError(cutAngle, spinY, power);")
-    out.append("}")
-    out.append("")
-
-    # metadata: keep same object name and export style as your MLP version
-    out.append("// Model metadata")
-    out.append("const ANGLE_MODEL_INFO = {")
-    out.append('  modelType: "piecewise_poly_ridge",')
-    out.append(f"  degree: {poly_degree},")
-    out.append(f"  clip: {clip_val:g},")
-    out.append(f"  nSamples: {n_samples_total},")
-    out.append('  features: ["cutAngle", "spinY", "power"],')
-    out.append("  piecewise: {")
-    out.append("    brackets: [")
-    for r in results:
-        out.append(f"      {{ pmin: {r['pmin']}, pmax: {r['pmax']}, split: {r['split']}, n: {r['n']} }},")
-    out.append("    ]")
-    out.append("  },")
-    out.append("  metrics: {")
-    out.append(f"    rSquared: {metrics['r2']:.6f},")
-    out.append(f"    rmse: {metrics['rmse']:.6f},")
-    out.append(f"    mae: {metrics['mae']:.6f}")
-    out.append("  }")
-    out.append("};")
-    out.append("")
-    out.append("// Export for use in modules")
-    out.append('if (typeof module !== "undefined" && module.exports) {')
-    out.append("  module.exports = { predictAngleError, calculateAimAdjustment, ANGLE_MODEL_INFO };")
-    out.append("}")
-    out.append("")
+        for r in results
+    ]
+
+    # Wrapper with bracket routing; powers below the first bracket, above the
+    # last or inside a skipped bracket fall to the nearest bracket below
+    out.append(JS_WRAPPER_HEAD)
+    out.append("  // route to bracket by power (clamped to the nearest bracket)")
+    out.append(route_tree(sorted(results, key=lambda r: r["pmin"]), 1) if results else "  return 0;")
+
+    out.append(
+        JS_FOOTER_TEMPLATE.format(
+            poly_degree=poly_degree,
+            clip=clip_val,
+            n_samples_total=n_samples_total,
+            bracket_info="\n".join(
+                f"      {{ pmin: {r['pmin']}, pmax: {r['pmax']}, split: {r['split']}, n: {r['n']} }},"
+                for r in results
+            ),
+            **metrics,
+        )
+    )
     return "\n".join(out)
 
 
@@ -300,28 +438,37 @@ def main():
 
     rows = load_rows(args.input)
 
-    X_all, y_all, p_all = [], [], []
-    for r in rows:
-        if "cutAngle" not in r or "power" not in r or TARGET not in r:
-            continue
-        try:
-            cut = float(r["cutAngle"])
-            power = float(r["power"])
-            y = float(r[TARGET])
-        except (TypeError, ValueError):
-            continue
-        X_all.append([cut, power])
-        y_all.append(y)
-        p_all.append(power)
+    data = rows_to_array(rows)
+    data = data[np.isfinite(data).all(axis=1)]
 
-    X_all = np.array(X_all, dtype=float)
-    y_all = np.array(y_all, dtype=float)
-    p_all = np.array(p_all, dtype=float)
+    X_all = data[:, :2]
+    y_all = data[:, 2]
 
     if X_all.shape[0] < 200:
         raise RuntimeError(f"Not enough usable rows: {X_all.shape[0]}")
 
-    brackets = POWER_BRACKETS if POWER_BRACKETS is not None else make_brackets_auto(p_all, AUTO_BRACKETS_N)
+    brackets = POWER_BRACKETS if POWER_BRACKETS is not None else make_brackets_auto(X_all[:, 1], AUTO_BRACKETS_N)
+
+    # The generated JS routes by binary search on power, which needs disjoint brackets
+    by_pmin = sorted(brackets)
+    for (lo_a, hi_a), (lo_b, hi_b) in zip(by_pmin, by_pmin[1:]):
+        if lo_b < hi_a:
+            raise ValueError(f"Power brackets overlap: [{lo_a}, {hi_a}) and [{lo_b}, {hi_b})")
+
+    # Sort row indices by power once: each [pmin, pmax) bracket is then a
+    # contiguous run located by binary search, instead of a boolean mask over
+    # all rows. Each bracket's rows are handed on in file order, so the seeded
+    # train/test shuffle draws the same holdout rows as masking would
+    order = np.argsort(X_all[:, 1], kind="stable")
+    powers = X_all[order, 1]
+    starts = np.searchsorted(powers, [pmin for pmin, _ in brackets], side="left")
+    ends = np.searchsorted(powers, [pmax for _, pmax in brackets], side="left")
+    bracket_rows = [np.sort(order[a:b]) for a, b in zip(starts, ends)]
+
+    # The polynomial expansion is row-wise, so expand every row once up front;
+    # brackets and their train/test splits just slice it
+    poly = PolynomialFeatures(degree=POLY_DEGREE, include_bias=True).fit(X_all)
+    Phi_all = poly.transform(X_all)
 
     print("Power brackets:", brackets)
     print()
@@ -332,93 +479,41 @@ def main():
     y_test_all = []
     y_pred_all = []
 
-    for bi, (pmin, pmax) in enumerate(brackets):
-        mask = (p_all >= pmin) & (p_all < pmax)
-        Xb = X_all[mask]
-        yb = y_all[mask]
-
-        if len(yb) < MIN_SAMPLES_PER_BRACKET:
-            print(f"[Bracket {bi}] power in [{pmin},{pmax}) -> SKIP (n={len(yb)})")
+    for bi, ((pmin, pmax), idx) in enumerate(zip(brackets, bracket_rows)):
+        n = len(idx)
+        if n < MIN_SAMPLES_PER_BRACKET:
+            print(f"[Bracket {bi}] power in [{pmin},{pmax}) -> SKIP (n={n})")
             continue
 
-        X_train, X_test, y_train, y_test = train_test_split(
-            Xb, yb, test_size=TEST_SIZE, random_state=RANDOM_SEED
-        )
-
-        best = None
-        for split in range(SPLIT_MIN, SPLIT_MAX + 1, SPLIT_STEP):
-            mL = build_poly_ridge(POLY_DEGREE, RIDGE_ALPHA)
-            mR = build_poly_ridge(POLY_DEGREE, RIDGE_ALPHA)
-
-            fitted = fit_piecewise_cutangle(X_train, y_train, split, mL, mR)
-            if fitted is None:
-                continue
-            mL, mR = fitted
-
-            pred = predict_piecewise_cutangle(X_test, split, mL, mR)
-            score = rmse(y_test, pred)
-
-            if best is None or score < best["rmse"]:
-                best = {"split": split, "rmse": score, "mL": mL, "mR": mR}
-
-        if best is None:
+        fit = fit_bracket(X_all[idx], Phi_all[idx], y_all[idx], RANDOM_SEED)
+        if fit is None:
             print(f"[Bracket {bi}] power in [{pmin},{pmax}) -> FAILED to find valid split")
             continue
 
-        split = best["split"]
-        mL = best["mL"]
-        mR = best["mR"]
-
-        pred = predict_piecewise_cutangle(X_test, split, mL, mR)
-
-        br_rmse = rmse(y_test, pred)
-        br_r2 = r2_score(y_test, pred)
-
-        left_mask = X_test[:, 0] < split
-        rmse_left = rmse(y_test[left_mask], pred[left_mask]) if np.any(left_mask) else float("nan")
-        rmse_right = rmse(y_test[~left_mask], pred[~left_mask]) if np.any(~left_mask) else float("nan")
-
-        results.append(
-            {
-                "bi": bi,
-                "pmin": float(pmin),
-                "pmax": float(pmax),
-                "split": int(split),
-                "rmse": float(br_rmse),
-                "r2": float(br_r2),
-                "rmse_left": float(rmse_left),
-                "rmse_right": float(rmse_right),
-                "mL": mL,
-                "mR": mR,
-                "n": int(len(yb)),
-            }
-        )
+        results.append({"bi": bi, "pmin": float(pmin), "pmax": float(pmax), "n": n, **fit})
 
         # accumulate overall holdout
-        y_test_all.append(y_test)
-        y_pred_all.append(pred)
+        y_test_all.append(fit["y_test"])
+        y_pred_all.append(fit["pred"])
 
-        print(f"[Bracket {bi}] power [{pmin},{pmax}) n={len(yb)}")
-        print(f"  best split: cutAngle < {split}")
+        print(f"[Bracket {bi}] power [{pmin},{pmax}) n={n}")
+        print(f"  best split: cutAngle < {fit['split']}")
         print(
-            f"  RMSE={br_rmse:.4f}   R2={br_r2:.4f}   "
-            f"RMSE_left={rmse_left:.4f}   RMSE_right={rmse_right:.4f}"
+            f"  RMSE={fit['rmse']:.4f}   R2={fit['r2']:.4f}   "
+            f"RMSE_left={fit['rmse_left']:.4f}   RMSE_right={fit['rmse_right']:.4f}"
         )
         print()
 
     if results and y_test_all:
         yt = np.concatenate(y_test_all)
         yp = np.concatenate(y_pred_all)
-        overall = {
-            "r2": float(r2_score(yt, yp)),
-            "rmse": float(rmse(yt, yp)),
-            "mae": float(mean_absolute_error(yt, yp)),
-        }
+        overall = regression_metrics(yt, yp)
     else:
         overall = {"r2": 0.0, "rmse": 0.0, "mae": 0.0}
 
     js = build_js(
         results=results,
+        feature_names=poly.get_feature_names_out(),
         input_filename=args.input.name,
         n_samples_total=int(X_all.shape[0]),
         poly_degree=POLY_DEGREE,